@@ -1,15 +1,23 @@
-from http.server import HTTPServer, SimpleHTTPRequestHandler
-
-class CORSRequestHandler(SimpleHTTPRequestHandler):
-    def end_headers(self):
-        self.send_header('Access-Control-Allow-Origin', '*')  # Allow all origins
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        super().end_headers()
+import uvicorn
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
 
 PORT = 7000  # Use your desired port
-server_address = ('0.0.0.0', PORT)
-httpd = HTTPServer(server_address, CORSRequestHandler)
 
-print(f"Serving on http://0.0.0.0:{PORT}")
-httpd.serve_forever()
+app = Starlette(
+    routes=[Mount("/", app=StaticFiles(directory="."))],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],  # Allow all origins
+            allow_methods=["GET", "POST", "OPTIONS"],
+            allow_headers=["Content-Type"],
+        ),
+    ],
+)
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=PORT)
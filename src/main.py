@@ -1,13 +1,91 @@
 import json
 import logging
+import pickle
+import shutil
 import pystac
-from pystac import Catalog, CatalogType, Collection, Item, Asset, Link
+from pystac import Catalog, CatalogType, Collection, Item, Asset, Link, StacIO
+from pystac.cache import ResolvedObjectCache
+from pystac.stac_io import DefaultStacIO
+from pystac.utils import make_absolute_href, make_relative_href
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson is not None else json.loads
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUMMARY_CACHE_PATH = os.path.join(".cache", "summaries.bin")
+
+DROUGHT_SUMMARY_FILE = "drought-vulnerability-summary_0.json"
+
+SDG_SUMMARY_FILE = "sdg-15-3-1-summary.json"
+
+CONFORMS_TO = (
+    "https://api.stacspec.org/v1.0.0/item-search",
+    "https://api.stacspec.org/v1.0.0-rc.2/item-search#filter",
+    "http://www.opengis.net/spec/cql2/1.0/conf/basic-cql2",
+    "http://www.opengis.net/spec/cql2/1.0/conf/cql2-text",
+    "https://api.stacspec.org/v1.0.0/collections",
+    "https://api.stacspec.org/v1.0.0/core",
+    "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/oas30",
+    "https://api.stacspec.org/v1.0.0/ogcapi-features",
+    "https://api.stacspec.org/v1.0.0/item-search#fields",
+    "https://api.stacspec.org/v1.0.0/item-search#query",
+    "https://api.stacspec.org/v1.0.0/item-search#sort",
+    "http://www.opengis.net/spec/ogcapi-features-3/1.0/conf/filter",
+    "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/core",
+    "http://www.opengis.net/spec/cql2/1.0/conf/cql2-json",
+    "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/geojson",
+)
+
+GLOBAL_BBOX = (-180, -90, 180, 90)
+
+DATASETS_START_DATE = datetime(2015, 1, 1)
+
+THUMBNAIL_HREF = "https://docs.trends.earth/en/latest/_static/trends_earth_logo_square_32x32.ico"
+
+@dataclass(slots=True)
+class CountryScan:
+    """Assets and summary properties found in one country folder."""
+
+    name: str
+    drought_assets: list
+    sdg_assets: list
+    drought_properties: dict
+    sdg_properties: dict
+
+class OrjsonStacIO(DefaultStacIO):
+    """StacIO that writes orjson output to local files as raw bytes.
+
+    pystac already serializes with orjson when it is installed, but then
+    decodes the result to text only for it to be encoded again on write.
+    """
+
+    def save_json(self, dest, json_dict, *args, **kwargs):
+        href = os.fspath(dest)
+        if orjson is None or "://" in href:
+            return super().save_json(dest, json_dict, *args, **kwargs)
+
+        data = orjson.dumps(json_dict, option=orjson.OPT_INDENT_2)
+        # Try the write first and only create the folder when it is
+        # missing, rather than checking for it before every file.
+        try:
+            f = open(href, "wb")
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(href), exist_ok=True)
+            f = open(href, "wb")
+        with f:
+            f.write(data)
+
 def create_root_catalog():
     """Create the root STAC Catalog."""
     catalog = Catalog(
@@ -17,37 +95,21 @@ def create_root_catalog():
         title="Trends.Earth STAC API",
     )
 
-
     catalog.extra_fields.update({
-        "conformsTo": [
-            "https://api.stacspec.org/v1.0.0/item-search",
-            "https://api.stacspec.org/v1.0.0-rc.2/item-search#filter",
-            "http://www.opengis.net/spec/cql2/1.0/conf/basic-cql2",
-            "http://www.opengis.net/spec/cql2/1.0/conf/cql2-text",
-            "https://api.stacspec.org/v1.0.0/collections",
-            "https://api.stacspec.org/v1.0.0/core",
-            "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/oas30",
-            "https://api.stacspec.org/v1.0.0/ogcapi-features",
-            "https://api.stacspec.org/v1.0.0/item-search#fields",
-            "https://api.stacspec.org/v1.0.0/item-search#query",
-            "https://api.stacspec.org/v1.0.0/item-search#sort",
-            "http://www.opengis.net/spec/ogcapi-features-3/1.0/conf/filter",
-            "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/core",
-            "http://www.opengis.net/spec/cql2/1.0/conf/cql2-json",
-            "http://www.opengis.net/spec/ogcapi-features-1/1.0/conf/geojson"
-        ]
+        "conformsTo": list(CONFORMS_TO)
     })
 
     return catalog
 
-def create_country_collection(country_name):
+def create_country_collection(country_name, now=None):
     """Create a STAC Collection for a country."""
+    now = now or datetime.now()
     collection = Collection(
         id=f"{country_name}-collection",
         description=f"STAC Collection for {country_name} datasets",
         extent=pystac.Extent(
-            spatial=pystac.SpatialExtent([[-180, -90, 180, 90]]),
-            temporal=pystac.TemporalExtent([[datetime(2015, 1, 1), datetime.now()]])
+            spatial=pystac.SpatialExtent([list(GLOBAL_BBOX)]),
+            temporal=pystac.TemporalExtent([[DATASETS_START_DATE, now]])
         ),
         title=f"{country_name} Datasets",
         license="proprietary",
@@ -56,7 +118,7 @@ def create_country_collection(country_name):
 
     collection.assets = {
         "thumbnail": Asset(
-            href="https://docs.trends.earth/en/latest/_static/trends_earth_logo_square_32x32.ico",
+            href=THUMBNAIL_HREF,
             media_type="image/ico",
             roles=["thumbnail"],
             title=f"{country_name} Dataset Thumbnail"
@@ -75,140 +137,310 @@ def create_country_item(
         item_id,
         item_description,
         assets,
-        properties=None
+        properties=None,
+        now=None
 ):
     item = Item(
         id=item_id,
         geometry=None,
         bbox=None,
-        datetime=datetime.now(),
+        datetime=now or datetime.now(),
         properties=properties if properties else {}
     )
-    for asset_key, asset_path in assets.items():
+    for asset_key, asset_path in assets:
         item.add_asset(asset_key, Asset(href=asset_path))
     return item
 
-def read_summary_json(file_path):
-    """Read and parse the summary JSON file."""
-    if not os.path.exists(file_path):
+COMMON_SUMMARY_FIELDS = (
+    ("id", ("id",)),
+    ("status", ("status",)),
+    ("start_date", ("start_date",)),
+    ("end_date", ("end_date",)),
+    ("progress", ("progress",)),
+    ("task_name", ("task_name",)),
+    ("script_version", ("script", "version")),
+    ("area_of_interest", ("local_context", "area_of_interest_name")),
+)
+
+DROUGHT_SUMMARY_FIELDS = COMMON_SUMMARY_FIELDS + (
+    ("drought_summary", ("results", "data", "report", "drought")),
+)
+
+SDG_SUMMARY_FIELDS = COMMON_SUMMARY_FIELDS + (
+    ("sdg_summary", ("land_condition", "baseline", "sdg", "summary")),
+)
+
+def get_nested(data, path):
+    """Follow a tuple of keys into nested dicts, returning None if absent."""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+def extract_fields(summary_data, fields):
+    """Pick the requested fields out of a parsed summary document.
+
+    ``fields`` is a sequence of ``(property_name, key_path)`` pairs;
+    missing paths map to None.
+    """
+    return {name: get_nested(summary_data, path) for name, path in fields}
+
+def load_summary_cache(cache_path=SUMMARY_CACHE_PATH):
+    """Load the cache of extracted summary properties from disk."""
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable summary cache {cache_path}: {e}")
+        return {}
+
+def save_summary_cache(summary_cache, cache_path=SUMMARY_CACHE_PATH):
+    """Persist the cache of extracted summary properties to disk."""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, "wb") as f:
+        pickle.dump(summary_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def read_summary_json(file_path, fields, summary_cache=None):
+    """Read the summary JSON file and extract the requested fields.
+
+    When ``summary_cache`` is given, results are cached per file and
+    reused for as long as the file's mtime and size are unchanged.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
         logger.warning(f"Summary file {file_path} does not exist.")
         return None
 
-    with open(file_path, "r") as f:
+    cache_key = os.path.abspath(file_path)
+    stamp = (stat.st_mtime_ns, stat.st_size, fields)
+    if summary_cache is not None:
+        cached = summary_cache.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            return dict(cached[1])
+
+    with open(file_path, "rb") as f:
         try:
-            return json.load(f)
-        except json.JSONDecodeError as e:
+            summary_data = json_loads(f.read())
+        except ValueError as e:
             logger.error(f"Error parsing JSON file {file_path}: {e}")
             return None
-
-def extract_properties_from_drought_summary(summary_data):
-    """Extract relevant properties from the drought summary JSON data."""
     if not summary_data:
-        return {}
+        return None
 
-    properties = {
-        "id": summary_data.get("id"),
-        "status": summary_data.get("status"),
-        "start_date": summary_data.get("start_date"),
-        "end_date": summary_data.get("end_date"),
-        "progress": summary_data.get("progress"),
-        "task_name": summary_data.get("task_name"),
-        "script_version": summary_data.get("script", {}).get("version"),
-        "area_of_interest": summary_data.get("local_context", {}).get("area_of_interest_name"),
-        "drought_summary": summary_data.get("results", {}).get("data", {}).get("report", {}).get("drought")
-    }
+    properties = extract_fields(summary_data, fields)
+    if summary_cache is not None:
+        summary_cache[cache_key] = (stamp, dict(properties))
     return properties
 
-def extract_properties_from_sdg_summary(summary_data):
-    """Extract relevant properties from the SDG summary JSON data."""
-    if not summary_data:
-        return {}
+def extract_properties_from_drought_summary(file_path, summary_cache=None):
+    """Extract relevant properties from the drought summary JSON file."""
+    return read_summary_json(file_path, DROUGHT_SUMMARY_FIELDS, summary_cache) or {}
 
-    properties = {
-        "id": summary_data.get("id"),
-        "status": summary_data.get("status"),
-        "start_date": summary_data.get("start_date"),
-        "end_date": summary_data.get("end_date"),
-        "progress": summary_data.get("progress"),
-        "task_name": summary_data.get("task_name"),
-        "script_version": summary_data.get("script", {}).get("version"),
-        "area_of_interest": summary_data.get("local_context", {}).get("area_of_interest_name"),
-        "sdg_summary": summary_data.get("land_condition", {}).get("baseline", {}).get("sdg", {}).get("summary")
-    }
-    return properties
+def extract_properties_from_sdg_summary(file_path, summary_cache=None):
+    """Extract relevant properties from the SDG summary JSON file."""
+    return read_summary_json(file_path, SDG_SUMMARY_FIELDS, summary_cache) or {}
+
+def is_dir_entry(entry):
+    """Return whether a DirEntry is a directory, treating errors as no."""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
 
-def scan_data_folder(data_folder):
-    if not os.path.exists(data_folder):
+def list_countries(data_folder):
+    """List the country folders directly under the data folder."""
+    with os.scandir(data_folder) as it:
+        return [entry.name for entry in it if is_dir_entry(entry)]
+
+def scan_country(data_folder, country, summary_cache=None):
+    """Collect the assets and summary properties of one country folder."""
+    country_path = os.path.join(data_folder, country)
+    drought_assets = []
+    sdg_assets = []
+    drought_summary_file_path = os.path.join(country_path, DROUGHT_SUMMARY_FILE)
+    sdg_summary_file_path = os.path.join(country_path, SDG_SUMMARY_FILE)
+
+    # Walk the country folder top-down like os.walk, reusing the file
+    # type cached on each DirEntry instead of stat'ing every entry.
+    stack = [(country_path, country)]
+    while stack:
+        root, rel_root = stack.pop()
+        subdirs = []
+        try:
+            it = os.scandir(root)
+        except OSError as e:
+            # Skip unreadable folders, as os.walk does.
+            logger.warning(f"Skipping folder {root}: {e}")
+            continue
+        with it:
+            for entry in it:
+                if is_dir_entry(entry):
+                    if not entry.is_symlink():
+                        subdirs.append((entry.path, os.path.join(rel_root, entry.name)))
+                    continue
+                file = entry.name
+                if "drought" in file and file != DROUGHT_SUMMARY_FILE:
+                    assets = drought_assets
+                elif "sdg-15-3-1" in file and file != SDG_SUMMARY_FILE:
+                    assets = sdg_assets
+                else:
+                    continue
+                assets.append((file.replace('.', '_'), os.path.join(rel_root, file)))
+        stack.extend(reversed(subdirs))
+
+    drought_properties = extract_properties_from_drought_summary(drought_summary_file_path, summary_cache)
+    sdg_properties = extract_properties_from_sdg_summary(sdg_summary_file_path, summary_cache)
+
+    return CountryScan(country, drought_assets, sdg_assets, drought_properties, sdg_properties)
+
+def scan_data_folder(data_folder, summary_cache=None):
+    """Scan every country folder, overlapping the per-country disk I/O.
+
+    Results are yielded in country order so that callers can keep building
+    the STAC catalog on the calling thread.
+    """
+    try:
+        countries = list_countries(data_folder)
+    except FileNotFoundError:
         logger.error(f"Data folder {data_folder} does not exist.")
         return
+    except OSError as e:
+        logger.error(f"Data folder {data_folder} could not be read: {e}")
+        return
+    logger.info(f"Scanning folder {data_folder}, {countries}")
 
-    countries = {}
-    for root, dirs, files in os.walk(data_folder):
-        logger.info(f"Scanning folder {root}, {dirs}")
-        if root == data_folder:
-            countries = dirs
-            break
-
-    for country in countries:
-        country_path = os.path.join(data_folder, country)
-        datasets = {"drought": {}, "sdg-15-3-1": {}}
-        drought_summary_file_path = os.path.join(country_path, "drought-vulnerability-summary_0.json")
-        sdg_summary_file_path = os.path.join(country_path, "sdg-15-3-1-summary.json")
-
-        drought_summary_data = read_summary_json(drought_summary_file_path)
-        sdg_summary_data = read_summary_json(sdg_summary_file_path)
-
-        drought_properties = extract_properties_from_drought_summary(drought_summary_data)
-        sdg_properties = extract_properties_from_sdg_summary(sdg_summary_data)
-
-        for root, dirs, files in os.walk(country_path):
-            for file in files:
-                if "drought" in file and file != "drought-vulnerability-summary_0.json":
-                    asset_key = file.replace('.', '_')
-                    datasets["drought"][asset_key] = os.path.relpath(os.path.join(root, file), start=data_folder)
-                elif "sdg-15-3-1" in file and file != "sdg-15-3-1-summary.json":
-                    asset_key = file.replace('.', '_')
-                    datasets["sdg-15-3-1"][asset_key] = os.path.relpath(os.path.join(root, file), start=data_folder)
-        yield country, datasets, drought_properties, sdg_properties
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(
+            partial(scan_country, data_folder, summary_cache=summary_cache),
+            countries
+        )
+
+def write_items_ndjson(items, f, ndjson_href):
+    """Append saved Items to an open JSON Lines file, one Item per line.
+
+    Link and asset hrefs are made relative to ``ndjson_href`` so that the
+    file can be consumed on its own.
+    """
+    for item in items:
+        item_href = item.get_self_href()
+        item_dict = item.to_dict(include_self_link=False)
+        for entry in item_dict["links"] + list(item_dict["assets"].values()):
+            entry["href"] = make_relative_href(
+                make_absolute_href(entry["href"], item_href), ndjson_href
+            )
+        if orjson is not None:
+            f.write(orjson.dumps(item_dict))
+        else:
+            f.write(json.dumps(item_dict, separators=(",", ":")).encode("utf-8"))
+        f.write(b"\n")
+
+def save_country_collection(catalog, collection):
+    """Save a country collection and its items next to the root catalog."""
+    catalog_folder = os.path.dirname(catalog.get_self_href())
+    collection.normalize_hrefs(os.path.join(catalog_folder, collection.id))
+    collection.save()
+
+def release_country_collection(catalog, collection):
+    """Detach a saved collection so that it can be garbage collected.
+
+    The root catalog keeps a plain href child link to the saved file.
+    """
+    for link in catalog.get_child_links():
+        if link.target is collection:
+            link.title = collection.title
+            link.target = collection.get_self_href()
+
+    # ResolvedObjectCache.remove() misses objects that were cached before
+    # their hrefs were normalized, and remove_child() goes through it too,
+    # so the root is given a fresh cache instead. This relies on pystac's
+    # private _resolved_objects attribute, hence the pystac pin in
+    # requirements.txt.
+    if not isinstance(getattr(catalog, "_resolved_objects", None), ResolvedObjectCache):
+        raise RuntimeError(
+            "pystac no longer exposes Catalog._resolved_objects; "
+            "release_country_collection needs updating for this pystac version."
+        )
+    catalog._resolved_objects = ResolvedObjectCache()
+    catalog._resolved_objects.cache(catalog)
+
+def replace_folder(src, dest):
+    """Move a freshly built folder into place, replacing any previous one."""
+    old = f"{dest}_old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(dest):
+        os.rename(dest, old)
+    os.rename(src, dest)
+    shutil.rmtree(old, ignore_errors=True)
 
 def main():
     data_folder = "src/data"
+    catalog_folder = "catalog"
+    # The catalog is built in a scratch folder and only swapped in once it
+    # has been saved completely, so a failed run leaves the old one intact.
+    build_folder = f"{catalog_folder}_build"
 
     logger.info("Creating STAC Trends Earth catalog")
+    StacIO.set_default(OrjsonStacIO)
 
     # Create the root catalog
     catalog = create_root_catalog()
+    catalog.normalize_hrefs(build_folder)
+    catalog.catalog_type = CatalogType.SELF_CONTAINED
+    now = datetime.now()
+    summary_cache = load_summary_cache()
 
-    for country, datasets, drought_properties, sdg_properties in scan_data_folder(data_folder):
-        logger.info(f"{country}: {len(datasets)}")
-        country_collection = create_country_collection(country)
-
-        if datasets["drought"]:
-            drought_item = create_country_item(
-                country,
-                f"{country}_drought",
-                f"STAC Item for {country} Drought Dataset",
-                datasets["drought"],
-                properties=drought_properties
-            )
-            country_collection.add_item(drought_item)
-
-        if datasets["sdg-15-3-1"]:
-            sdg_item = create_country_item(
-                country,
-                f"{country}_sdg_15_3_1",
-                f"STAC Item for {country} SDG 15.3.1 Dataset",
-                datasets["sdg-15-3-1"],
-                properties=sdg_properties
-            )
-            country_collection.add_item(sdg_item)
+    shutil.rmtree(build_folder, ignore_errors=True)
+    os.makedirs(build_folder)
+    try:
+        # Each country is saved as soon as it is built, so only one country's
+        # collection and items are held in memory at a time.
+        ndjson_href = os.path.abspath(os.path.join(build_folder, "items.ndjson"))
+        with open(ndjson_href, "wb") as items_ndjson:
+            for scan in scan_data_folder(data_folder, summary_cache):
+                country = scan.name
+                logger.info(f"{country}: {len(scan.drought_assets) + len(scan.sdg_assets)}")
+                country_collection = create_country_collection(country, now=now)
+                items = []
 
-        catalog.add_child(country_collection)
+                if scan.drought_assets:
+                    items.append(create_country_item(
+                        country,
+                        f"{country}_drought",
+                        f"STAC Item for {country} Drought Dataset",
+                        scan.drought_assets,
+                        properties=scan.drought_properties,
+                        now=now
+                    ))
 
-    catalog.normalize_and_save(
-        root_href="catalog",
-        catalog_type=CatalogType.SELF_CONTAINED
-    )
+                if scan.sdg_assets:
+                    items.append(create_country_item(
+                        country,
+                        f"{country}_sdg_15_3_1",
+                        f"STAC Item for {country} SDG 15.3.1 Dataset",
+                        scan.sdg_assets,
+                        properties=scan.sdg_properties,
+                        now=now
+                    ))
+
+                country_collection.add_items(items)
+                catalog.add_child(country_collection)
+
+                save_country_collection(catalog, country_collection)
+                write_items_ndjson(items, items_ndjson, ndjson_href)
+                release_country_collection(catalog, country_collection)
+
+        catalog.save()
+    except BaseException:
+        shutil.rmtree(build_folder, ignore_errors=True)
+        raise
+
+    save_summary_cache(summary_cache)
+    replace_folder(build_folder, catalog_folder)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file